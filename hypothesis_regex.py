@@ -1,14 +1,28 @@
+from array import array
+import binascii
 from collections import namedtuple
+import functools
+import itertools
+import math
 import re
 import six
 import six.moves
 import string
+import warnings
 import sre_parse as sre
 import sys
+import unicodedata
+import hypothesis
 import hypothesis.errors as he
 import hypothesis.strategies as hs
 
-__all__ = ['regex']
+try:
+    import regex as regex_module
+except ImportError:
+    regex_module = None
+
+__all__ = ['regex', 'analyze', 'Analysis', 'RejectionRiskWarning',
+           'Frontend', 'FRONTENDS']
 
 
 HAS_SUBPATTERN_FLAGS = sys.version_info[:2] >= (3, 6)
@@ -20,6 +34,7 @@ UNICODE_CATEGORIES = set([
     'Pf', 'Pi', 'Po', 'Ps', 'Sc', 'Sk', 'Sm', 'So', 'Zl',
     'Zp', 'Zs',
 ])
+UNICODE_ALL_CATEGORIES = UNICODE_CATEGORIES | set(['Cc', 'Cs'])
 
 
 SPACE_CHARS = u' \t\n\r\f\v'
@@ -32,6 +47,92 @@ UNICODE_WORD_CATEGORIES = UNICODE_LETTER_CATEGORIES | set(['Nd', 'Nl', 'No'])
 HAS_WEIRD_WORD_CHARS = (2, 7) <= sys.version_info[:2] < (3, 4)
 UNICODE_WEIRD_NONWORD_CHARS = u'\U00012432\U00012433\U00012456\U00012457'
 
+# Repeats of char sets are generated in blocks of up to REPEAT_BLOCK_SIZE chars,
+# each block is drawn as a single random number that is split into indexes of
+# chars. Sets that are not listed explicitly (e.g. '\d', '.' or '[^a]') need a
+# table of their chars computed from unicode database, so they are generated
+# that way only when repeated at least LARGE_REPEAT_COUNT times.
+REPEAT_BLOCK_SIZE = 1024
+LARGE_REPEAT_COUNT = 256
+
+RISK_LOW = 'low'
+RISK_MEDIUM = 'medium'
+RISK_HIGH = 'high'
+RISK_LEVELS = (RISK_LOW, RISK_MEDIUM, RISK_HIGH)
+
+# Constructs reported by `analyze()` and how likely they make generated
+# examples to be rejected by the final match filter. Constructs that are only
+# expensive to generate (but are generated correctly) have low risk.
+CONSTRUCT_RISKS = {
+    'word boundary': RISK_HIGH,
+    'anchor in the middle': RISK_HIGH,
+    'negative lookaround': RISK_HIGH,
+    'positive lookaround': RISK_MEDIUM,
+    'backreference': RISK_MEDIUM,
+    'group exists condition': RISK_MEDIUM,
+    'possessive quantifier': RISK_MEDIUM,
+    'atomic group': RISK_MEDIUM,
+    'large repeat': RISK_HIGH,
+    'nested unbounded repeat': RISK_LOW,
+    'huge char set': RISK_LOW,
+}
+
+# Char sets enumerating more chars than this are reported as 'huge char set'
+HUGE_CHARSET_SIZE = 10000
+# Repeats generated element by element (i.e. not constant text or char set)
+# with at least that many elements in total are reported as 'large repeat'
+LARGE_REPEAT_ELEMENTS = 1000
+
+# Charset element code (in addition to SRE ones) for a set of unicode categories,
+# e.g. from regex module '\p{L}'. Value is a frozenset of category names.
+CATEGORIES = 'categories'
+# Element codes (in addition to SRE ones) for regex module grapheme cluster '\X'
+# (value is None) and for zero-width marker of a construct that was translated
+# to its plain counterpart, e.g. possessive quantifier (value is construct name
+# as in `CONSTRUCT_RISKS`)
+GRAPHEME = 'grapheme'
+CONSTRUCT = 'construct'
+
+UNICODE_CATEGORY_NAMES = {
+    'Lu': 'Uppercase_Letter', 'Ll': 'Lowercase_Letter', 'Lt': 'Titlecase_Letter',
+    'LC': 'Cased_Letter', 'Lm': 'Modifier_Letter', 'Lo': 'Other_Letter',
+    'Mn': 'Nonspacing_Mark', 'Mc': 'Spacing_Mark', 'Me': 'Enclosing_Mark',
+    'Nd': 'Decimal_Number', 'Nl': 'Letter_Number', 'No': 'Other_Number',
+    'Pc': 'Connector_Punctuation', 'Pd': 'Dash_Punctuation',
+    'Ps': 'Open_Punctuation', 'Pe': 'Close_Punctuation',
+    'Pi': 'Initial_Punctuation', 'Pf': 'Final_Punctuation',
+    'Po': 'Other_Punctuation',
+    'Sm': 'Math_Symbol', 'Sc': 'Currency_Symbol', 'Sk': 'Modifier_Symbol',
+    'So': 'Other_Symbol',
+    'Zs': 'Space_Separator', 'Zl': 'Line_Separator', 'Zp': 'Paragraph_Separator',
+    'Cc': 'Control', 'Cf': 'Format', 'Cs': 'Surrogate', 'Co': 'Private_Use',
+    'Cn': 'Unassigned',
+}
+UNICODE_MAJOR_CATEGORY_NAMES = {
+    'L': 'Letter', 'M': 'Mark', 'N': 'Number', 'P': 'Punctuation',
+    'S': 'Symbol', 'Z': 'Separator', 'C': 'Other',
+}
+UNICODE_MARK_CATEGORIES = set(['Mn', 'Mc', 'Me'])
+
+# Grapheme cluster is generated as a non-mark char followed by marks
+GRAPHEME_CODES = [
+    (sre.IN, [(CATEGORIES, frozenset(
+        UNICODE_CATEGORIES - set(['LC']) - UNICODE_MARK_CATEGORIES
+    ))]),
+    (sre.MAX_REPEAT, (0, 4294967295, [
+        (sre.IN, [(CATEGORIES, frozenset(UNICODE_MARK_CATEGORIES))]),
+    ])),
+]
+
+
+Analysis = namedtuple('Analysis', [
+    'min_length', 'max_length', 'cost', 'constructs', 'risk',
+])
+
+
+class RejectionRiskWarning(UserWarning):
+    'Warning about regex that is likely to have generated examples rejected'
+
 
 class Context(object):
     __slots__ = ['groups', 'flags']
@@ -41,6 +142,64 @@ class Context(object):
         self.flags = flags
 
 
+class AnalysisContext(object):
+    __slots__ = ['groups', 'flags', 'constructs', 'cost', 'unbounded', 'repeats']
+
+    def __init__(self, flags=0):
+        self.groups = {}
+        self.flags = flags
+        self.constructs = []
+        self.cost = 0
+        self.unbounded = False
+        # Number of times current element is repeated by enclosing repeats
+        self.repeats = 1
+
+    def add_construct(self, construct):
+        if construct not in self.constructs:
+            self.constructs.append(construct)
+
+
+def _normalize_property_name(name):
+    return re.sub(r'[\s_-]', '', name).lower()
+
+
+def _unicode_property_table():
+    'Returns mapping of normalized unicode property names to sets of categories'
+    table = {}
+    for category, name in UNICODE_CATEGORY_NAMES.items():
+        categories = frozenset(['Lu', 'Ll', 'Lt'] if category == 'LC'
+                               else [category])
+        table[_normalize_property_name(category)] = categories
+        table[_normalize_property_name(name)] = categories
+    for major, name in UNICODE_MAJOR_CATEGORY_NAMES.items():
+        categories = frozenset(
+            category for category in UNICODE_ALL_CATEGORIES
+            if category[0] == major and category != 'LC'
+        )
+        table[_normalize_property_name(major)] = categories
+        table[_normalize_property_name(name)] = categories
+    table['l&'] = table['lc']
+    table['combiningmark'] = table['m']
+    return table
+
+
+UNICODE_PROPERTIES = _unicode_property_table()
+
+
+_charset_codepoints_cache = {}
+_category_codepoints_cache = {}
+
+
+def _category_codepoints(category):
+    'Returns sorted array of codepoints of given unicode category'
+    if not _category_codepoints_cache:
+        for x in six.moves.range(sys.maxunicode + 1):
+            _category_codepoints_cache.setdefault(
+                unicodedata.category(six.unichr(x)), array('I'),
+            ).append(x)
+    return _category_codepoints_cache.get(category, array('I'))
+
+
 class CharactersBuilder(object):
     '''
     Helper object that allows to configure `characters()` strategy with various
@@ -98,14 +257,61 @@ class CharactersBuilder(object):
 
         return hs.one_of(*strategies) if strategies else hs.just(u'')
 
+    @property
+    def chars(self):
+        '''
+        Returns string of configured chars (sorted) if char set consists only of
+        explicitly added chars, otherwise None
+        '''
+        if self._negate or self._categories:
+            return None
+        return u''.join(sorted(self._whitelist_chars - self._blacklist_chars))
+
+    @property
+    def codepoints(self):
+        '''
+        Returns sorted array of codepoints of configured char set (without
+        control chars and surrogates for negated sets, the same way as
+        `strategy` does). Sets with unicode categories are computed from unicode
+        database, which is slow for the first time.
+        '''
+        max_codepoint = sys.maxunicode if self._unicode else 127
+        if self._negate:
+            categories = UNICODE_ALL_CATEGORIES - self._categories - \
+                set(['Cc', 'Cs', 'LC'])
+            include = self._blacklist_chars - self._whitelist_chars
+            exclude = self._whitelist_chars
+        else:
+            categories = self._categories - set(['Cs', 'LC'])
+            include = self._whitelist_chars - self._blacklist_chars
+            exclude = self._blacklist_chars
+
+        key = (frozenset(categories), max_codepoint,
+               frozenset(include), frozenset(exclude))
+        if key not in _charset_codepoints_cache:
+            excluded = set(ord(c) for c in exclude)
+            codepoints = set(ord(c) for c in include)
+            for x in itertools.chain(*[_category_codepoints(category)
+                                       for category in categories]):
+                if x > max_codepoint:
+                    break
+                if x not in excluded:
+                    codepoints.add(x)
+            _charset_codepoints_cache[key] = array('I', sorted(codepoints))
+
+        return _charset_codepoints_cache[key]
+
     def add_category(self, category):
         '''
         Add unicode category to set
 
         Unicode categories are strings like 'Ll', 'Lu', 'Nd', etc.
-        See `unicodedata.category()`
+        See `unicodedata.category()`. SRE categories (e.g. `sre.CATEGORY_DIGIT`)
+        are converted to corresponding unicode categories and chars.
         '''
-        if category == sre.CATEGORY_DIGIT:
+        if category in UNICODE_ALL_CATEGORIES:
+            self._categories.add(category)
+        elif category == sre.CATEGORY_DIGIT:
             self._categories |= UNICODE_DIGIT_CATEGORIES
         elif category == sre.CATEGORY_NOT_DIGIT:
             self._categories |= UNICODE_CATEGORIES - UNICODE_DIGIT_CATEGORIES
@@ -140,8 +346,138 @@ class CharactersBuilder(object):
                 self._whitelist_chars.add(c)
 
 
-@hs.defines_strategy
-def regex(regex):
+class Frontend(object):
+    """
+    Regex dialect front-end. Compiles patterns (compiled regex is used for final
+    match check) and parses them into SRE regex parse tree that `_strategy()`
+    understands.
+    """
+    def compile(self, pattern):
+        'Returns compiled regex for given pattern'
+        raise NotImplementedError()
+
+    def is_compiled(self, regex):
+        'Returns True if given object is a regex compiled by this dialect'
+        raise NotImplementedError()
+
+    def flags(self, regex):
+        'Returns flags of given compiled regex converted to `re` module flags'
+        raise NotImplementedError()
+
+    def parse(self, pattern, flags=0):
+        '''
+        Returns SRE regex parse tree for given pattern and flags (as returned by
+        `flags()`)
+        '''
+        raise NotImplementedError()
+
+
+class ReFrontend(Frontend):
+    'Front-end for standard `re` module syntax'
+    def compile(self, pattern):
+        return re.compile(pattern)
+
+    def is_compiled(self, regex):
+        return isinstance(regex, type(re.compile('')))
+
+    def flags(self, regex):
+        return regex.flags
+
+    def parse(self, pattern, flags=0):
+        return sre.parse(pattern)
+
+
+class RegexModuleFrontend(Frontend):
+    """
+    Front-end for third-party `regex` module syntax.
+
+    In addition to `re` syntax it supports unicode general category properties
+    ('\\p{L}', '\\pL', '\\P{Lu}', '\\p{^Letter}', '\\p{gc=Nd}'), grapheme
+    clusters ('\\X'), possessive quantifiers ('a++', 'a{2,3}+') and atomic
+    groups ('(?>...)'), named groups ('(?<name>...)') and group references
+    ('\\g<name>'). Those are translated to SRE regex parse tree elements
+    (possessive quantifiers and atomic groups to their plain counterparts,
+    relying on final match check).
+    """
+    FLAGS = [
+        ('IGNORECASE', re.IGNORECASE), ('LOCALE', re.LOCALE),
+        ('MULTILINE', re.MULTILINE), ('DOTALL', re.DOTALL),
+        ('UNICODE', re.UNICODE), ('VERBOSE', re.VERBOSE),
+        ('ASCII', getattr(re, 'ASCII', 0)),
+    ]
+
+    def compile(self, pattern):
+        if regex_module is None:
+            raise he.InvalidArgument(
+                'Regex syntax "regex" requires "regex" module to be installed'
+            )
+        return regex_module.compile(pattern)
+
+    def is_compiled(self, regex):
+        return regex_module is not None and \
+            isinstance(regex, type(regex_module.compile('')))
+
+    def flags(self, regex):
+        flags = 0
+        for name, re_flag in self.FLAGS:
+            if regex.flags & getattr(regex_module, name):
+                flags |= re_flag
+        return flags
+
+    def parse(self, pattern, flags=0):
+        excluded = set()
+        while True:
+            rewritten, placeholders, sources = _rewrite_regex_module_pattern(
+                pattern, verbose=bool(flags & re.VERBOSE), excluded=excluded,
+            )
+            try:
+                codes = sre.parse(rewritten)
+            except re.error as e:
+                # Positions refer to rewritten pattern, so only message is
+                # reported (with placeholders turned back into source text)
+                message = getattr(e, 'msg', None) or str(e)
+                for c, source in sources.items():
+                    message = message.replace(c, source)
+                raise he.InvalidArgument(
+                    'Unsupported regex syntax in %r: %s' % (pattern, message)
+                )
+
+            # Escaped chars (e.g. '\\uE000') could clash with placeholders
+            clashes = _placeholder_clashes(codes, placeholders)
+            if not clashes:
+                return _replace_placeholders(codes, placeholders)
+            excluded |= clashes
+
+
+FRONTENDS = {
+    're': ReFrontend(),
+    'regex': RegexModuleFrontend(),
+}
+
+
+def _compile(regex, syntax):
+    """
+    Return tuple of front-end and compiled regex for given regex (string or
+    compiled regex) and syntax name (key in `FRONTENDS`, None to autodetect).
+    """
+    if syntax is None:
+        frontend = FRONTENDS['re']
+        for f in FRONTENDS.values():
+            if f.is_compiled(regex):
+                frontend = f
+                break
+    elif syntax in FRONTENDS:
+        frontend = FRONTENDS[syntax]
+    else:
+        raise he.InvalidArgument('Unknown regex syntax: %s' % syntax)
+
+    if not hasattr(regex, 'pattern'):
+        regex = frontend.compile(regex)
+
+    return frontend, regex
+
+
+def regex(regex, warn=False, syntax=None):
     """Return strategy that generates strings that match given regex.
 
     Regex can be either a string or compiled regex (through `re.compile()`).
@@ -155,18 +491,84 @@ def regex(regex):
     are considered normal groups. Negative lookahead/lookbehind groups do not do
     anything. Ternary regex groups ('(?(name)yes-pattern|no-pattern)') are not
     supported at all.
+
+    Regexes in other dialects are handled by front-ends registered in `FRONTENDS`.
+    Compiled regexes of third-party `regex` module are detected automatically,
+    for patterns given as strings pass `syntax='regex'`. Generated examples are
+    always checked with the `match()` of compiled regex of that dialect.
+
+    If `warn` is True, `RejectionRiskWarning` is issued right away for regexes
+    that `analyze()` finds to have medium or high risk of rejection.
     """
-    if not hasattr(regex, 'pattern'):
-        regex = re.compile(regex)
+    if warn:
+        analysis = analyze(regex, syntax=syntax)
+        if analysis.risk != RISK_LOW:
+            warnings.warn(
+                'Regex %r has %s risk of rejection: %s' % (
+                    getattr(regex, 'pattern', regex), analysis.risk,
+                    ', '.join(analysis.constructs),
+                ),
+                RejectionRiskWarning,
+                stacklevel=2,
+            )
+
+    return _regex(regex, syntax=syntax)
+
+
+@hs.defines_strategy
+def _regex(regex, syntax=None):
+    'Return strategy for `regex()` (built lazily by Hypothesis)'
+    frontend, regex = _compile(regex, syntax)
 
     pattern = regex.pattern
-    flags = regex.flags
+    flags = frontend.flags(regex)
 
-    codes = sre.parse(pattern)
+    codes = frontend.parse(pattern, flags)
 
     return _strategy(codes, Context(flags=flags)).filter(regex.match)
 
 
+def analyze(regex, syntax=None):
+    """Statically analyze regex and return `Analysis` of it.
+
+    Regex can be either a string or compiled regex (through `re.compile()`).
+    `syntax` selects regex dialect the same way as in `regex()`.
+
+    Analysis has following fields:
+
+    * min_length, max_length - minimum and maximum length of text that regex
+      matches (max_length is None if it is unbounded)
+    * cost - estimate of how expensive it is to construct a strategy for regex
+      and generate an example (roughly number of parse tree elements, multiplied
+      by repeat count for repeats that are generated element by element, plus
+      number of chars enumerated by char sets)
+    * constructs - list of constructs that rely on final match filter or are
+      expensive to generate, e.g. 'word boundary' or 'backreference'
+      (see `CONSTRUCT_RISKS`)
+    * risk - predicted risk of generated examples being rejected: one of
+      'low', 'medium' or 'high' (highest risk of found constructs)
+    """
+    frontend, regex = _compile(regex, syntax)
+
+    flags = frontend.flags(regex)
+    codes = frontend.parse(regex.pattern, flags)
+
+    context = AnalysisContext(flags=flags)
+    min_length, max_length = _analyze(codes, context, start=True, end=True)
+
+    risk = RISK_LOW
+    for construct in context.constructs:
+        risk = max(risk, CONSTRUCT_RISKS[construct], key=RISK_LEVELS.index)
+
+    return Analysis(
+        min_length=min_length,
+        max_length=max_length,
+        cost=context.cost,
+        constructs=context.constructs,
+        risk=risk,
+    )
+
+
 def _strategy(codes, context):
     """
     Convert SRE regex parse tree to strategy that generates strings matching that
@@ -237,32 +639,7 @@ def _strategy(codes, context):
 
         elif code == sre.IN:
             # Regex '[abc0-9]' (set of characters)
-            charsets = value
-
-            builder = CharactersBuilder(negate=charsets[0][0] == sre.NEGATE,
-                                        flags=context.flags)
-
-            for charset_code, charset_value in charsets:
-                if charset_code == sre.NEGATE:
-                    # Regex '[^...]' (negation)
-                    pass
-                elif charset_code == sre.LITERAL:
-                    # Regex '[a]' (single char)
-                    builder.add_chars(six.unichr(charset_value))
-                elif charset_code == sre.RANGE:
-                    # Regex '[a-z]' (char range)
-                    low, high = charset_value
-                    for x in six.moves.range(low, high+1):
-                        builder.add_chars(six.unichr(x))
-                elif charset_code == sre.CATEGORY:
-                    # Regex '[\w]' (char category)
-                    builder.add_category(charset_value)
-                else:
-                    raise he.InvalidArgument(
-                        'Unknown charset code: %s' % charset_code
-                    )
-
-            return builder.strategy
+            return _charset_builder(value, context).strategy
 
         elif code == sre.ANY:
             # Regex '.' (any char)
@@ -314,10 +691,24 @@ def _strategy(codes, context):
             at_least, at_most, regex = value
             if at_most == 4294967295:
                 at_most = None
+
+            if at_least > 0 or at_most is not None:
+                strat = _repeat_strategy(regex, context, at_least, at_most)
+                if strat is not None:
+                    return strat
+
             return hs.lists(_strategy(regex, context),
                             min_size=at_least,
                             max_size=at_most).map(''.join)
 
+        elif code == GRAPHEME:
+            # Regex '\X' (grapheme cluster, regex module syntax)
+            return _strategy(GRAPHEME_CODES, context)
+
+        elif code == CONSTRUCT:
+            # Marker of construct translated to its plain counterpart
+            return hs.just(u'')
+
         elif code == sre.GROUPREF_EXISTS:
             # Regex '(?(id/name)yes-pattern|no-pattern)' (if group exists selection)
             return hs.one_of(
@@ -327,3 +718,715 @@ def _strategy(codes, context):
 
         else:
             raise he.InvalidArgument('Unknown code point: %s' % repr(code))
+
+
+def _charset_builder(charsets, context):
+    """
+    Return `CharactersBuilder` configured with given SRE charset elements
+    (value of 'in' element).
+    """
+    builder = CharactersBuilder(negate=charsets[0][0] == sre.NEGATE,
+                                flags=context.flags)
+
+    for charset_code, charset_value in charsets:
+        if charset_code == sre.NEGATE:
+            # Regex '[^...]' (negation)
+            pass
+        elif charset_code == sre.LITERAL:
+            # Regex '[a]' (single char)
+            builder.add_chars(six.unichr(charset_value))
+        elif charset_code == sre.RANGE:
+            # Regex '[a-z]' (char range)
+            low, high = charset_value
+            for x in six.moves.range(low, high+1):
+                builder.add_chars(six.unichr(x))
+        elif charset_code == sre.CATEGORY:
+            # Regex '[\w]' (char category)
+            builder.add_category(charset_value)
+        elif charset_code == CATEGORIES:
+            # Regex '[\p{L}]' (unicode categories, regex module syntax)
+            for category in charset_value:
+                builder.add_category(category)
+        else:
+            raise he.InvalidArgument(
+                'Unknown charset code: %s' % charset_code
+            )
+
+    return builder
+
+
+def _constant_text(codes, context):
+    """
+    Return text that given SRE regex elements always match (e.g. for regex 'abc'
+    or '(?:abc)') or None if elements can match different strings.
+    """
+    if context.flags & re.IGNORECASE:
+        return None
+
+    chunks = []
+    for code, value in codes:
+        if code == sre.LITERAL:
+            chunks.append(six.unichr(value))
+        elif code == sre.SUBPATTERN and value[0] is None and \
+                (not HAS_SUBPATTERN_FLAGS or not (value[1] or value[2])):
+            text = _constant_text(value[-1], context)
+            if text is None:
+                return None
+            chunks.append(text)
+        else:
+            return None
+
+    return u''.join(chunks)
+
+
+def _charset_codepoints(codes, context, large=False):
+    """
+    Return sorted array of codepoints if given SRE regex elements represent
+    single char from a char set, otherwise None. Sets that are not listed
+    explicitly (e.g. '\\d', '.' or '[^a]') are returned only if `large` is True.
+    """
+    if len(codes) != 1:
+        return None
+
+    # '.' and '[^a]' are not limited to ASCII chars (see `_strategy()`)
+    unicode_flags = (context.flags & ~getattr(re, 'ASCII', 0)) | re.UNICODE
+
+    code, value = codes[0]
+    if code == sre.IN:
+        builder = _charset_builder(value, context)
+    elif code == sre.LITERAL:
+        builder = CharactersBuilder(flags=context.flags)
+        builder.add_chars(six.unichr(value))
+    elif code == sre.NOT_LITERAL:
+        builder = CharactersBuilder(negate=True, flags=unicode_flags)
+        builder.add_chars(six.unichr(value))
+    elif code == sre.ANY:
+        builder = CharactersBuilder(negate=True, flags=unicode_flags)
+        if not context.flags & re.DOTALL:
+            builder.add_chars(u'\n')
+    else:
+        return None
+
+    if builder.chars is None and not large:
+        return None
+
+    return builder.codepoints or None
+
+
+def _repeat_text(text, at_least, at_most):
+    'Return strategy that generates given text repeated given number of times'
+    if at_least == at_most:
+        return hs.just(text * at_least)
+
+    return hs.integers(min_value=at_least, max_value=at_most).map(
+        lambda n: text * n
+    )
+
+
+def _codepoints_text(codepoints):
+    'Return text consisting of chars with given codepoints (array)'
+    data = codepoints.tobytes() if hasattr(codepoints, 'tobytes') \
+        else codepoints.tostring()
+    return data.decode('utf-32-le' if sys.byteorder == 'little' else 'utf-32-be')
+
+
+@hs.composite
+def _repeat_chars(draw, codepoints, at_least, at_most):
+    """
+    Return strategy that generates strings of given length range consisting of
+    chars with given codepoints.
+
+    Instead of drawing each char separately, strings are generated in blocks of
+    up to `REPEAT_BLOCK_SIZE` chars. Each block is drawn as a single random
+    number (with enough bytes for all chars to be equally likely) which is then
+    split into indexes of chars, so it takes only as many bytes as needed to
+    encode the block.
+    """
+    n = at_least if at_least == at_most else \
+        draw(hs.integers(min_value=at_least, max_value=at_most))
+
+    base = len(codepoints)
+    blocks = []
+    for start in six.moves.range(0, n, REPEAT_BLOCK_SIZE):
+        size = min(n - start, REPEAT_BLOCK_SIZE)
+        nbytes = (base ** size).bit_length() // 8 + 2
+        data = draw(hs.binary(min_size=nbytes, max_size=nbytes))
+        x = int(binascii.hexlify(data), 16)
+
+        block = array('I')
+        for _ in six.moves.range(size):
+            x, i = divmod(x, base)
+            block.append(codepoints[i])
+        blocks.append(_codepoints_text(block))
+
+    return u''.join(blocks)
+
+
+def _repeat_strategy(codes, context, at_least, at_most):
+    """
+    Return strategy that generates strings matching given SRE regex elements
+    repeated from `at_least` to `at_most` (None means unbounded) times, or None
+    if elements are neither constant text nor char set.
+
+    Constant text is repeated with string multiplication and char sets are
+    generated with `_repeat_chars()`. Unbounded part of a repeat is generated
+    with a list strategy as usual.
+    """
+    text = _constant_text(codes, context)
+    if text is not None:
+        repeat = functools.partial(_repeat_text, text)
+    else:
+        large = max(at_least, at_most or 0) >= LARGE_REPEAT_COUNT
+        codepoints = _charset_codepoints(codes, context, large=large)
+        if codepoints is None:
+            return None
+        repeat = functools.partial(_repeat_chars, codepoints)
+
+    if at_most is not None:
+        return repeat(at_least, at_most)
+
+    return hs.tuples(
+        repeat(at_least, at_least),
+        hs.lists(_strategy(codes, context)).map(u''.join),
+    ).map(u''.join)
+
+
+def _min_length(codes):
+    'Return minimum length of text matching given SRE regex elements'
+    if not isinstance(codes, tuple):
+        # List of codes
+        return sum(_min_length(c) for c in codes)
+
+    # Single code
+    code, value = codes
+    if code in [sre.LITERAL, sre.NOT_LITERAL, sre.ANY, sre.IN, GRAPHEME]:
+        return 1
+    elif code == sre.SUBPATTERN:
+        return _min_length(value[-1])
+    elif code == sre.BRANCH:
+        return min(_min_length(branch) for branch in value[1])
+    elif code in [sre.MIN_REPEAT, sre.MAX_REPEAT]:
+        return value[0] * _min_length(value[2])
+    elif code == sre.GROUPREF_EXISTS:
+        return min(_min_length(value[1]),
+                   _min_length(value[2]) if value[2] else 0)
+    # Anchors, lookarounds and construct markers are zero-width. Group
+    # references can be empty.
+    return 0
+
+
+def _add_lengths(a, b):
+    return None if a is None or b is None else a + b
+
+
+def _analyze(codes, context, start=False, end=False):
+    """
+    Walk SRE regex parse tree the same way `_strategy()` does and collect
+    information about it into `context`.
+
+    Returns tuple of minimum and maximum length of text matching given elements
+    (maximum is None if unbounded). `start` and `end` are True if given elements
+    are at the beginning/end of the whole regex, where anchors are expected.
+    """
+    if not isinstance(codes, tuple):
+        # List of codes
+        # Element is at the start (end) if everything before (after) it can
+        # match empty string
+        min_lengths = [_min_length(c) for c in codes]
+        empty_before = [True]
+        for x in min_lengths:
+            empty_before.append(empty_before[-1] and x == 0)
+        empty_after = [True]
+        for x in reversed(min_lengths):
+            empty_after.append(empty_after[-1] and x == 0)
+        empty_after.reverse()
+
+        min_length, max_length = 0, 0
+        for i, c in enumerate(codes):
+            lo, hi = _analyze(c, context,
+                              start=start and empty_before[i],
+                              end=end and empty_after[i + 1])
+            min_length += lo
+            max_length = _add_lengths(max_length, hi)
+
+        return min_length, max_length
+
+    # Single code
+    code, value = codes
+    context.cost += 1
+
+    if code in [sre.LITERAL, sre.NOT_LITERAL, sre.ANY]:
+        return 1, 1
+
+    elif code == sre.IN:
+        for charset_code, charset_value in value:
+            if charset_code == sre.RANGE:
+                low, high = charset_value
+                context.cost += high - low + 1
+                if high - low + 1 > HUGE_CHARSET_SIZE:
+                    context.add_construct('huge char set')
+            elif charset_code in [sre.LITERAL, sre.CATEGORY, CATEGORIES]:
+                context.cost += 1
+            elif charset_code != sre.NEGATE:
+                raise he.InvalidArgument(
+                    'Unknown charset code: %s' % charset_code
+                )
+        return 1, 1
+
+    elif code == sre.AT:
+        if value in [sre.AT_BOUNDARY, sre.AT_NON_BOUNDARY]:
+            context.add_construct('word boundary')
+        elif value in [sre.AT_BEGINNING, sre.AT_END] and \
+                context.flags & re.MULTILINE:
+            # '^' and '$' also match at line boundaries
+            pass
+        elif not (start and value in [sre.AT_BEGINNING, sre.AT_BEGINNING_STRING]) \
+                and not (end and value in [sre.AT_END, sre.AT_END_STRING]):
+            context.add_construct('anchor in the middle')
+        return 0, 0
+
+    elif code == sre.SUBPATTERN:
+        old_flags = context.flags
+        if HAS_SUBPATTERN_FLAGS:
+            context.flags = (context.flags | value[1]) & ~value[2]
+
+        lengths = _analyze(value[-1], context, start=start, end=end)
+
+        context.flags = old_flags
+
+        if value[0]:
+            context.groups[value[0]] = lengths
+        return lengths
+
+    elif code == sre.GROUPREF:
+        context.add_construct('backreference')
+        return context.groups[value]
+
+    elif code == sre.ASSERT:
+        context.add_construct('positive lookaround')
+        _analyze(value[1], context, start=start, end=end)
+        return 0, 0
+
+    elif code == sre.ASSERT_NOT:
+        context.add_construct('negative lookaround')
+        _analyze(value[1], context, start=start, end=end)
+        return 0, 0
+
+    elif code == sre.BRANCH:
+        lengths = [_analyze(branch, context, start=start, end=end)
+                   for branch in value[1]]
+        max_lengths = [hi for _, hi in lengths]
+        return (
+            min(lo for lo, _ in lengths),
+            None if None in max_lengths else max(max_lengths),
+        )
+
+    elif code in [sre.MIN_REPEAT, sre.MAX_REPEAT]:
+        at_least, at_most, regex = value
+        if at_most == 4294967295:
+            at_most = None
+
+        # Number of elements generated for repeat (unbounded tail is generated
+        # with a list strategy of a small average size)
+        count = at_least if at_most is None else at_most
+        # Estimated number of data buffer bytes if repeat is generated with
+        # `_repeat_strategy()`, None if it is generated element by element
+        size = None
+        if count > 0:
+            if _constant_text(regex, context) is not None:
+                size = 0
+            else:
+                codepoints = _charset_codepoints(
+                    regex, context, large=count >= LARGE_REPEAT_COUNT,
+                )
+                if codepoints is not None:
+                    size = count * math.log(len(codepoints), 256)
+                    # One draw per block, plus enumerating chars of category
+                    # based sets (enumerated sets are counted below)
+                    context.cost += -(-count // REPEAT_BLOCK_SIZE)
+                    if _charset_codepoints(regex, context) is None:
+                        context.cost += len(codepoints)
+
+        if size is not None:
+            if size * context.repeats > hypothesis.settings.default.buffer_size:
+                context.add_construct('large repeat')
+        elif count * context.repeats >= LARGE_REPEAT_ELEMENTS:
+            context.add_construct('large repeat')
+
+        old_unbounded = context.unbounded
+        old_repeats = context.repeats
+        if at_most is None:
+            if context.unbounded:
+                context.add_construct('nested unbounded repeat')
+            context.unbounded = True
+        if size is None:
+            context.repeats *= max(count, 1)
+
+        cost = context.cost
+        lo, hi = _analyze(regex, context)
+        if size is None:
+            context.cost += (context.cost - cost) * (max(count, 1) - 1)
+
+        context.unbounded = old_unbounded
+        context.repeats = old_repeats
+
+        if hi == 0:
+            return 0, 0
+        return (
+            at_least * lo,
+            None if at_most is None or hi is None else at_most * hi,
+        )
+
+    elif code == GRAPHEME:
+        return 1, None
+
+    elif code == CONSTRUCT:
+        context.add_construct(value)
+        return 0, 0
+
+    elif code == sre.GROUPREF_EXISTS:
+        context.add_construct('group exists condition')
+        lo, hi = _analyze(value[1], context, start=start, end=end)
+        if value[2]:
+            no_lo, no_hi = _analyze(value[2], context, start=start, end=end)
+        else:
+            no_lo, no_hi = 0, 0
+        return (
+            min(lo, no_lo),
+            None if hi is None or no_hi is None else max(hi, no_hi),
+        )
+
+    else:
+        raise he.InvalidArgument('Unknown code point: %s' % repr(code))
+
+
+# Regex module quantifier in braces, e.g. '{2}', '{2,}', '{,3}' or '{2,3}'
+REPEAT_BRACES_RE = re.compile(r'\{\d*(,\d*)?\}')
+# Inline flags, e.g. '(?x)', '(?i-x:'
+INLINE_FLAGS_RE = re.compile(r'\(\?([a-zA-Z01]*)(?:-([a-zA-Z]*))?([:)])')
+# Group exists condition, e.g. '(?(1)' or '(?(name)'
+GROUP_CONDITION_RE = re.compile(r'\(\?\(\w+\)')
+# Group reference, e.g. '\g<name>' or '\g<1>'
+GROUP_REFERENCE_RE = re.compile(r'\\g<(\w+)>')
+# POSIX char class inside char set, e.g. '[:alpha:]' or '[:^digit:]'
+POSIX_CLASS_RE = re.compile(r'\[:\^?\w+:\]')
+PLACEHOLDER_CHARS_START = 0xE000
+VERBOSE_SPACE_CHARS = ' \t\n\r\f\v'
+
+
+def _unicode_property_categories(name, negate=False):
+    """
+    Return frozenset of unicode categories for regex module property name (text
+    in braces of '\\p{...}'). Only general category properties are supported.
+
+    Negated properties do not include 'Cc' and 'Cs' categories (the same way
+    negated char sets do not generate control chars and surrogates).
+    """
+    if name.startswith('^'):
+        negate = not negate
+        name = name[1:]
+
+    if '=' in name:
+        key, name = name.split('=', 1)
+        if _normalize_property_name(key) not in ('gc', 'generalcategory'):
+            raise he.InvalidArgument('Unsupported unicode property: %s' % key)
+
+    categories = UNICODE_PROPERTIES.get(_normalize_property_name(name))
+    if categories is None:
+        raise he.InvalidArgument('Unsupported unicode property: %s' % name)
+
+    if negate:
+        categories = frozenset(UNICODE_CATEGORIES - set(['LC']) - categories)
+
+    return categories
+
+
+def _rewrite_regex_module_pattern(pattern, verbose=False, excluded=()):
+    """
+    Rewrite regex module pattern to a pattern that `sre_parse` can parse.
+
+    Named groups and group references are rewritten to `re` syntax. Possessive
+    quantifiers become greedy ones and atomic groups become non-capturing
+    groups. In verbose mode whitespace and comments are removed.
+
+    Unicode properties ('\\p{...}'), grapheme clusters ('\\X') and markers of
+    possessive quantifiers and atomic groups are replaced with private use chars
+    (other than chars in `excluded`). Returns tuple of rewritten pattern, dict
+    mapping those chars to SRE regex elements for `_replace_placeholders()` and
+    dict mapping them to source text they replace (for error messages).
+
+    POSIX char classes ('[[:alpha:]]') are not supported and raise
+    `InvalidArgument`.
+    """
+    placeholders = {}
+    sources = {}
+    next_placeholder = [PLACEHOLDER_CHARS_START]
+
+    def placeholder(element, source):
+        while six.unichr(next_placeholder[0]) in pattern or \
+                six.unichr(next_placeholder[0]) in excluded:
+            next_placeholder[0] += 1
+        c = six.unichr(next_placeholder[0])
+        next_placeholder[0] += 1
+        placeholders[c] = element
+        sources[c] = source
+        return c
+
+    result = []
+    in_class = False
+    # Verbose mode of enclosing groups
+    groups = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            escape = pattern[i+1:i+2]
+            if escape in ('p', 'P'):
+                start = i
+                if pattern[i+2:i+3] == '{':
+                    end = pattern.find('}', i+3)
+                    if end == -1:
+                        raise he.InvalidArgument(
+                            'Missing "}" in unicode property at %d' % i
+                        )
+                    name = pattern[i+3:end]
+                    i = end + 1
+                else:
+                    name = pattern[i+2:i+3]
+                    i += 3
+                result.append(placeholder((sre.IN, [(CATEGORIES,
+                    _unicode_property_categories(name, negate=escape == 'P')
+                )]), pattern[start:i]))
+            elif escape == 'X' and not in_class:
+                result.append(placeholder((GRAPHEME, None), '\\X'))
+                i += 2
+            elif escape == 'g' and not in_class:
+                match = GROUP_REFERENCE_RE.match(pattern, i)
+                if not match:
+                    raise he.InvalidArgument(
+                        'Invalid group reference at %d' % i
+                    )
+                group = match.group(1)
+                result.append('(?:\\%s)' % group if group.isdigit()
+                              else '(?P=%s)' % group)
+                i = match.end()
+            else:
+                result.append(pattern[i:i+2])
+                i += 2
+            continue
+
+        if in_class:
+            if c == '[' and POSIX_CLASS_RE.match(pattern, i):
+                raise he.InvalidArgument(
+                    'Unsupported POSIX char class %s at %d' % (
+                        POSIX_CLASS_RE.match(pattern, i).group(0), i,
+                    )
+                )
+            if c == ']':
+                in_class = False
+            result.append(c)
+            i += 1
+            continue
+
+        if verbose and c in VERBOSE_SPACE_CHARS:
+            i += 1
+            continue
+
+        if verbose and c == '#':
+            end = pattern.find('\n', i)
+            i = len(pattern) if end == -1 else end + 1
+            continue
+
+        if c == '[':
+            # '^' and ']' right after '[' are part of char set
+            j = i + 1
+            if pattern[j:j+1] == '^':
+                j += 1
+            if pattern[j:j+1] == ']':
+                j += 1
+            result.append(pattern[i:j])
+            in_class = True
+            i = j
+            continue
+
+        if c == '(' and pattern.startswith('(?#', i):
+            # Comment
+            end = pattern.find(')', i)
+            i = len(pattern) if end == -1 else end + 1
+            continue
+
+        if c == '(':
+            match = INLINE_FLAGS_RE.match(pattern, i)
+            if match and match.group(3) == ')':
+                # Global inline flags, e.g. '(?x)'
+                verbose = verbose or 'x' in match.group(1)
+                result.append(match.group(0))
+                i = match.end()
+                continue
+
+            groups.append(verbose)
+            if match:
+                # Scoped inline flags, e.g. '(?x:...)'
+                if 'x' in match.group(1):
+                    verbose = True
+                if 'x' in (match.group(2) or ''):
+                    verbose = False
+                result.append(match.group(0))
+                i = match.end()
+            elif pattern.startswith('(?>', i):
+                # Atomic group becomes non-capturing group
+                result.append('(?:')
+                result.append(placeholder((CONSTRUCT, 'atomic group'), ''))
+                i += 3
+            elif GROUP_CONDITION_RE.match(pattern, i):
+                # Group exists condition '(?(name)...)'
+                match = GROUP_CONDITION_RE.match(pattern, i)
+                result.append(match.group(0))
+                i = match.end()
+            elif pattern.startswith('(?<', i) and \
+                    pattern[i+3:i+4] not in ('=', '!'):
+                # Named group '(?<name>...)'
+                result.append('(?P<')
+                i += 3
+            else:
+                result.append(pattern[i:i+3] if pattern[i+1:i+2] == '?' else c)
+                i += 3 if pattern[i+1:i+2] == '?' else 1
+            continue
+
+        if c == ')':
+            if groups:
+                verbose = groups.pop()
+            result.append(c)
+            i += 1
+            continue
+
+        quantifier = None
+        if c in '*+?':
+            quantifier = c
+        elif c == '{':
+            match = REPEAT_BRACES_RE.match(pattern, i)
+            if match:
+                quantifier = match.group(0)
+
+        if quantifier is None:
+            result.append(c)
+            i += 1
+            continue
+
+        result.append(quantifier)
+        i += len(quantifier)
+        if pattern[i:i+1] == '+':
+            # Possessive quantifier becomes greedy one
+            result.append(placeholder((CONSTRUCT, 'possessive quantifier'),
+                                      '+'))
+            i += 1
+        elif pattern[i:i+1] == '?':
+            # Lazy quantifier
+            result.append('?')
+            i += 1
+
+    return u''.join(result), placeholders, sources
+
+
+def _literals(codes):
+    'Yield char codes of all literals in SRE regex parse tree'
+    if not isinstance(codes, tuple):
+        # List of codes
+        for c in codes:
+            for x in _literals(c):
+                yield x
+        return
+
+    # Single code
+    code, value = codes
+    if code in [sre.LITERAL, sre.NOT_LITERAL]:
+        yield value
+    elif code == sre.IN:
+        for charset_code, charset_value in value:
+            if charset_code == sre.LITERAL:
+                yield charset_value
+    elif code in [sre.SUBPATTERN, sre.ASSERT, sre.ASSERT_NOT]:
+        for x in _literals(value[-1]):
+            yield x
+    elif code == sre.BRANCH:
+        for branch in value[1]:
+            for x in _literals(branch):
+                yield x
+    elif code in [sre.MIN_REPEAT, sre.MAX_REPEAT]:
+        for x in _literals(value[2]):
+            yield x
+    elif code == sre.GROUPREF_EXISTS:
+        for branch in value[1:]:
+            for x in _literals(branch or []):
+                yield x
+
+
+def _placeholder_clashes(codes, placeholders):
+    """
+    Return set of placeholder chars that occur in SRE regex parse tree more than
+    once (i.e. pattern itself contains them, e.g. escaped as '\\uE000')
+    """
+    counts = {}
+    for x in _literals(codes):
+        c = six.unichr(x)
+        if c in placeholders:
+            counts[c] = counts.get(c, 0) + 1
+    return set(c for c, count in counts.items() if count > 1)
+
+
+def _replace_placeholders(codes, placeholders):
+    """
+    Replace placeholder chars produced by `_rewrite_regex_module_pattern()` in
+    SRE regex parse tree with elements they stand for.
+    """
+    if not isinstance(codes, tuple):
+        # List of codes
+        return [_replace_placeholders(c, placeholders) for c in codes]
+
+    # Single code
+    code, value = codes
+    if code == sre.LITERAL and six.unichr(value) in placeholders:
+        return placeholders[six.unichr(value)]
+
+    elif code == sre.NOT_LITERAL and six.unichr(value) in placeholders:
+        # Regex '[^\p{L}]' (negated single property)
+        return (sre.IN, [(sre.NEGATE, None)] +
+                placeholders[six.unichr(value)][1])
+
+    elif code == sre.IN:
+        charsets = []
+        for charset_code, charset_value in value:
+            c = six.unichr(charset_value) \
+                if charset_code == sre.LITERAL else None
+            if c in placeholders:
+                charsets.extend(placeholders[c][1])
+            else:
+                charsets.append((charset_code, charset_value))
+        return (code, charsets)
+
+    elif code == sre.SUBPATTERN:
+        return (code, value[:-1] + (
+            _replace_placeholders(value[-1], placeholders),
+        ))
+
+    elif code in [sre.ASSERT, sre.ASSERT_NOT]:
+        return (code, (value[0], _replace_placeholders(value[1], placeholders)))
+
+    elif code == sre.BRANCH:
+        return (code, (value[0], [
+            _replace_placeholders(branch, placeholders) for branch in value[1]
+        ]))
+
+    elif code in [sre.MIN_REPEAT, sre.MAX_REPEAT]:
+        return (code, (
+            value[0], value[1], _replace_placeholders(value[2], placeholders),
+        ))
+
+    elif code == sre.GROUPREF_EXISTS:
+        return (code, (
+            value[0],
+            _replace_placeholders(value[1], placeholders),
+            _replace_placeholders(value[2], placeholders) if value[2] else value[2],
+        ))
+
+    return codes
@@ -23,6 +23,9 @@ setup(
         'hypothesis>=3.8',
         'six>=1.10',
     ],
+    extras_require={
+        'regex': ['regex'],
+    },
     setup_requires=['pytest-runner'],
     tests_require=['pytest'],
     classifiers=[
@@ -1,15 +1,19 @@
 import hypothesis as h
 import hypothesis.errors as he
 
-from hypothesis_regex import regex, UNICODE_CATEGORIES, UNICODE_DIGIT_CATEGORIES, \
-    UNICODE_SPACE_CATEGORIES, UNICODE_WORD_CATEGORIES, UNICODE_WEIRD_NONWORD_CHARS, \
-    SPACE_CHARS, UNICODE_SPACE_CHARS, HAS_WEIRD_WORD_CHARS
+from hypothesis_regex import regex, analyze, RejectionRiskWarning, \
+    FRONTENDS, CATEGORIES, \
+    UNICODE_CATEGORIES, UNICODE_DIGIT_CATEGORIES, UNICODE_SPACE_CATEGORIES, \
+    UNICODE_WORD_CATEGORIES, UNICODE_WEIRD_NONWORD_CHARS, SPACE_CHARS, \
+    UNICODE_SPACE_CHARS, HAS_WEIRD_WORD_CHARS
 import pytest
 import re
 import six
 import six.moves
+import sre_parse as sre
 import sys
 import unicodedata
+import warnings
 
 
 def is_ascii(s):
@@ -282,6 +286,54 @@ class TestRegexStrategy:
         assert_can_generate('ab{,10}')
         assert_can_generate('ab{5,}')
 
+    @pytest.mark.parametrize('pattern', [
+        'a{10000}', 'x(?:ab){3000}y', '[0-9]{4096}', '(?i)a{5000}',
+        '[a-f]{2000,3000}', '[a-z]{1500,}', 'ab{0,10}', '[a-c]{0,3}',
+    ])
+    def test_large_repeater(self, pattern):
+        assert_can_generate(pattern)
+
+    @pytest.mark.parametrize('pattern', [
+        '[0-9]{8000}', '[a-z]{8000}', '[0-9]{3000}x[0-9]{3000}', r'\d{5000}',
+        '.{3000}', '[^a]{3000}', r'\w{3000}',
+    ])
+    def test_repeater_near_buffer_size(self, pattern):
+        compiled_pattern = re.compile(pattern)
+
+        @h.settings(max_examples=20)
+        @h.given(regex(pattern))
+        def check(s):
+            assert compiled_pattern.match(s)
+
+        check()
+
+    def test_repeater_of_char_set_generates_all_chars(self):
+        strategy = regex('[0-9]{4096}')
+
+        h.find(strategy, lambda s: set(s) == set('0123456789'))
+
+    def test_large_repeater_of_char_set_is_not_periodic(self):
+        h.find(regex('[0-9]{4096}'), lambda s: s[:1024] != s[1024:2048])
+
+    def test_repeater_of_char_set_uses_all_chars_equally(self):
+        chars = u''.join(six.unichr(x) for x in range(0x100, 0x100 + 129))
+        examples = []
+
+        @h.settings(max_examples=50)
+        @h.given(regex(u'[%s]{1000}' % chars))
+        def collect(s):
+            examples.append(s)
+
+        collect()
+
+        text = u''.join(examples)
+        counts = sorted(text.count(c) for c in chars[1:-2])
+        median = counts[len(counts) // 2]
+        # With 129 chars and one byte per char, last two chars would be half as
+        # likely as others if bytes were simply taken modulo number of chars
+        assert text.count(chars[-1]) > 0.75 * median
+        assert text.count(chars[-2]) > 0.75 * median
+
     def test_branch(self):
         assert_can_generate('ab|cd|ef')
 
@@ -334,3 +386,226 @@ class TestRegexStrategy:
 
         with pytest.raises(he.NoSuchExample):
             h.find(strategy, lambda s: s[1] == 'B')
+
+
+class TestRegexModuleSyntax:
+    @pytest.fixture(autouse=True)
+    def regex_module(self):
+        self.regex_module = pytest.importorskip('regex')
+        return self.regex_module
+
+    def assert_can_generate(self, pattern):
+        compiled_pattern = self.regex_module.compile(pattern)
+
+        assert_all_examples(regex(compiled_pattern), compiled_pattern.match)
+
+    @pytest.mark.parametrize('pattern', [
+        r'\p{L}', r'\pN', r'\P{L}', r'\p{^Lu}', r'\p{Uppercase_Letter}',
+        r'\p{gc=Nd}', r'\p{General_Category=Punctuation}', r'[\p{Lu}\d_]',
+        r'[^\p{L}]', r'[]\p{N}]',
+    ])
+    def test_unicode_properties(self, pattern):
+        self.assert_can_generate(pattern)
+
+    def test_unicode_properties_generate_unicode_chars(self):
+        h.find(regex(r'\p{L}', syntax='regex'), lambda s: not is_ascii(s))
+
+    def test_grapheme_cluster(self):
+        self.assert_can_generate(r'\X')
+
+    @pytest.mark.parametrize('pattern', [r'a++b', r'a*+b', r'a?+b', r'a{2,3}+b'])
+    def test_possessive_quantifiers(self, pattern):
+        self.assert_can_generate(pattern)
+
+    def test_lazy_quantifier(self):
+        self.assert_can_generate(r'a+?b')
+
+    def test_atomic_group(self):
+        self.assert_can_generate(r'(?>ab|c)d')
+
+    def test_string_pattern_with_syntax(self):
+        assert_all_examples(
+            regex(r'\p{Lu}{3}', syntax='regex'),
+            lambda s: len(s) == 3 and all(
+                unicodedata.category(c) == 'Lu' for c in s
+            )
+        )
+
+    def test_flags(self, regex_module):
+        h.find(regex(regex_module.compile('a', regex_module.IGNORECASE)),
+               lambda s: s == 'A')
+        assert_all_examples(
+            regex(regex_module.compile(r'\w', regex_module.ASCII)),
+            is_ascii,
+        )
+
+    def test_negated_single_property_char_set(self):
+        letters = frozenset(['Lu', 'Ll', 'Lt', 'Lm', 'Lo'])
+
+        assert FRONTENDS['regex'].parse(r'[^\p{L}]') == [
+            (sre.IN, [(sre.NEGATE, None), (CATEGORIES, letters)]),
+        ]
+
+    @pytest.mark.parametrize('pattern', [r'\P{L}', r'\p{^L}', r'[^\p{L}]'])
+    def test_negated_property_excludes_controls_and_surrogates(self, pattern):
+        assert_all_examples(
+            regex(pattern, syntax='regex'),
+            lambda s: unicodedata.category(s) not in ('Cc', 'Cs'),
+        )
+
+    def test_escaped_private_use_char(self):
+        assert_all_examples(
+            regex(u'\\p{N}\\uE000', syntax='regex'),
+            lambda s: unicodedata.category(s[0])[0] == 'N' and s[1] == u'\uE000',
+        )
+
+    def test_verbose(self):
+        self.assert_can_generate('(?x) a # \\p{Greek} comment\n b')
+
+    def test_scoped_verbose(self):
+        assert_all_examples(
+            regex('(?x: a # comment\n) b', syntax='regex'),
+            lambda s: s == 'a b',
+        )
+
+    def test_comment(self):
+        self.assert_can_generate(r'(?#\p{Greek})a')
+
+    def test_named_group_and_group_references(self):
+        self.assert_can_generate(r'(?<x>[ab])\g<x>\g<1>(?<=a|b)(?<!c)')
+
+    def test_unsupported_syntax(self):
+        with pytest.raises(he.InvalidArgument):
+            regex(r'(?|(a)|(b))', syntax='regex').validate()
+
+    @pytest.mark.parametrize('pattern', [
+        r'\p{Greek}', r'\p{Script=Latin}', r'\p{Alphabetic}', r'\p{Any}',
+    ])
+    def test_unsupported_property(self, pattern):
+        with pytest.raises(he.InvalidArgument):
+            regex(pattern, syntax='regex').validate()
+
+    @pytest.mark.parametrize('pattern', [
+        r'[[:alpha:]]+', r'[a[:digit:]]', r'[^[:space:]]',
+    ])
+    def test_posix_char_class_is_unsupported(self, pattern):
+        with pytest.raises(he.InvalidArgument):
+            regex(pattern, syntax='regex').validate()
+
+    def test_posix_like_text_outside_char_set(self):
+        self.assert_can_generate(r'[:a:]')
+
+    def test_syntax_error_mentions_original_text(self):
+        with pytest.raises(he.InvalidArgument) as e:
+            regex(r'[\p{L}-z]', syntax='regex').validate()
+
+        assert r'\p{L}-z' in str(e.value)
+
+    def test_unknown_syntax(self):
+        with pytest.raises(he.InvalidArgument):
+            regex('a', syntax='foo').validate()
+
+    def test_analyze(self):
+        analysis = analyze(r'\p{L}{2,4}\b', syntax='regex')
+
+        assert analysis.min_length == 2
+        assert analysis.max_length == 4
+        assert analysis.constructs == ['word boundary']
+
+    @pytest.mark.parametrize('pattern,construct', [
+        (r'a++a', 'possessive quantifier'),
+        (r'a{2,}+a', 'possessive quantifier'),
+        (r'(?>a+)a', 'atomic group'),
+        (r'(?>^a)b', 'atomic group'),
+    ])
+    def test_analyze_translated_constructs(self, pattern, construct):
+        analysis = analyze(pattern, syntax='regex')
+
+        assert analysis.constructs == [construct]
+        assert analysis.risk == 'medium'
+
+    def test_analyze_grapheme_cluster(self):
+        analysis = analyze(r'\X+', syntax='regex')
+
+        assert analysis.min_length == 1
+        assert analysis.constructs == []
+
+
+class TestAnalyze:
+    @pytest.mark.parametrize('pattern,min_length,max_length', [
+        ('abc', 3, 3),
+        ('^ab?c$', 2, 3),
+        ('[a-z]{2,5}', 2, 5),
+        ('a+', 1, None),
+        ('(ab|c)\\1', 2, 4),
+        ('(a)?(?(1)bc|d)', 1, 3),
+        ('(?=ab)a', 1, 1),
+    ])
+    def test_lengths(self, pattern, min_length, max_length):
+        analysis = analyze(pattern)
+
+        assert analysis.min_length == min_length
+        assert analysis.max_length == max_length
+
+    def test_simple_pattern_has_low_risk(self):
+        analysis = analyze(re.compile(r'^[a-zA-Z0-9_.+-]+@[a-z0-9-]{2,}\.[a-z]+$'))
+
+        assert analysis.constructs == []
+        assert analysis.risk == 'low'
+
+    @pytest.mark.parametrize('pattern,construct,risk', [
+        (r'\bfoo', 'word boundary', 'high'),
+        (r'a^b', 'anchor in the middle', 'high'),
+        (r'a(?!b)', 'negative lookaround', 'high'),
+        (r'(a+)*', 'nested unbounded repeat', 'low'),
+        (r'(?<=a)b', 'positive lookaround', 'medium'),
+        (r'(a)\1', 'backreference', 'medium'),
+        (r'(a)?(?(1)b|c)', 'group exists condition', 'medium'),
+        (u'[\u0000-\uffff]', 'huge char set', 'low'),
+        (r'(ab|cd){3000}', 'large repeat', 'high'),
+        (r'(a|\w{50}){100}', 'large repeat', 'high'),
+        (u'[\u0100-\u2100]{8000}', 'large repeat', 'high'),
+    ])
+    def test_constructs(self, pattern, construct, risk):
+        analysis = analyze(pattern)
+
+        assert analysis.constructs == [construct]
+        assert analysis.risk == risk
+
+    @pytest.mark.parametrize('pattern', [
+        r'(^abc$)', r'(?:^a|^b)c$', r'^(a|b$)', r'\Aabc\Z', r'(?m)a$\n^b',
+        r'a(?m:$\n^)b', r'a?^b', r'(?:a|)^b', r'(?=^a)a', r'x*(?=$)', r'a$b?',
+    ])
+    def test_anchors_at_edges(self, pattern):
+        assert 'anchor in the middle' not in analyze(pattern).constructs
+
+    @pytest.mark.parametrize('pattern', [r'a^b', r'(a)^b', r'a$b', r'$a', r'a\Ab'])
+    def test_anchors_in_the_middle(self, pattern):
+        assert analyze(pattern).constructs == ['anchor in the middle']
+
+    def test_risk_is_highest_of_constructs(self):
+        assert analyze(r'(a)\1\b').risk == 'high'
+
+    def test_cost_includes_char_set_size(self):
+        assert analyze('[a-z]').cost > analyze('[a-c]').cost
+
+    def test_cost_includes_repeat_count(self):
+        assert analyze('(ab|c){50}').cost > 50 * analyze('(ab|c)').cost
+        assert analyze(r'\d{5000}').cost > analyze(r'\d').cost + 100
+
+    @pytest.mark.parametrize('pattern', [
+        r'a{10000}', r'[0-9]{8000}', r'\d{5000}', r'.{3000}', r'(a|b){10}',
+    ])
+    def test_large_repeats_generated_in_blocks_are_not_reported(self, pattern):
+        assert analyze(pattern).constructs == []
+
+    def test_regex_warns_about_risky_pattern(self):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            regex(r'\bfoo', warn=True)
+            regex(r'\bfoo')
+            regex(r'foo', warn=True)
+            regex(r'(ab+)*', warn=True)
+
+        assert [x.category for x in w] == [RejectionRiskWarning]
+        assert w[0].filename == __file__